@@ -7,16 +7,217 @@ Downloads pressure-level and single-level ERA5 data for a specified month.
 import os
 import sys
 import argparse
+import calendar
+import random
+import threading
+import time
 import cdsapi
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
+# Default number of CDS requests queued concurrently
+DEFAULT_CONCURRENCY = 4
+
+# Attempts per CDS request before giving up (exponential backoff with jitter)
+RETRIEVE_ATTEMPTS = 5
+
+# Per-thread cache of CDS clients (see _get_cds_client)
+_clients = threading.local()
+
 
 def ensure_dir(path):
     """Create directory if it doesn't exist."""
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
+def _get_cds_client():
+    """
+    Return this thread's cdsapi.Client, creating it on first use.
+
+    Reusing the client avoids re-reading ~/.cdsapirc and re-opening the HTTP
+    session for every request. Clients are kept per thread because
+    cdsapi.Client is not guaranteed to be thread-safe.
+    """
+    if not hasattr(_clients, "client"):
+        _clients.client = cdsapi.Client()
+    return _clients.client
+
+
+def drop_page_cache(path):
+    """
+    Tell the kernel we will not re-read path soon (posix_fadvise DONTNEED),
+    so finished downloads do not push other jobs' data out of the page cache.
+    No-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def retrieve_with_retry(dataset, request, target):
+    """
+    Run client.retrieve, retrying failures after 1, 2, 4, ... seconds plus
+    random jitter. The last error is re-raised.
+    """
+    client = _get_cds_client()
+    for attempt in range(RETRIEVE_ATTEMPTS):
+        try:
+            client.retrieve(dataset, request, str(target))
+            # The GRIB is read much later by ungrib.exe; don't keep it cached
+            drop_page_cache(target)
+            return
+        except Exception as e:
+            if attempt == RETRIEVE_ATTEMPTS - 1:
+                raise
+            delay = 2 ** attempt + random.random()
+            print(f"[WARN] {target.name}: attempt {attempt + 1} of {RETRIEVE_ATTEMPTS} failed ({e}); "
+                  f"retrying in {delay:.1f}s", flush=True)
+            time.sleep(delay)
+
+
+def run_concurrently(retrieve, jobs, concurrency):
+    """
+    Run retrieve(job) for every job on a bounded thread pool.
+
+    CDS requests spend most of their time waiting in the server-side queue,
+    so submitting them together lets the queue waits overlap.
+    Exits with status 1 once all requests have finished if any of them failed.
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(retrieve, job) for job in jobs]
+        for future in as_completed(futures):
+            status, target, error = future.result()
+            if status == "success":
+                print(f"[SUCCESS] Downloaded {target}", flush=True)
+            else:
+                print(f"[ERROR] Failed to download {target}: {error}", flush=True)
+                failed.append(target)
+
+    if failed:
+        print(f"[ERROR] {len(failed)} download(s) failed", flush=True)
+        sys.exit(1)
+
+
+def _is_valid_grib(path):
+    """Cheap integrity check: more than 1 KiB and starts with the GRIB magic bytes."""
+    try:
+        if path.stat().st_size <= 1024:
+            return False
+        with open(path, "rb") as f:
+            return f.read(4) == b"GRIB"
+    except OSError:
+        return False
+
+
+def _ok_marker(target):
+    """Path of the marker recording that target passed _is_valid_grib."""
+    return target.with_name(target.name + ".ok")
+
+
+def _is_complete(target):
+    """
+    True if target is a finished, valid download.
+
+    A .ok marker newer than the file skips re-reading the magic bytes;
+    otherwise the file is checked and the marker written if it passes.
+    """
+    if not target.exists():
+        return False
+    marker = _ok_marker(target)
+    if marker.exists() and marker.stat().st_mtime >= target.stat().st_mtime:
+        return True
+    if _is_valid_grib(target):
+        marker.touch()
+        return True
+    return False
+
+
+def _download_cds(dataset, request, target):
+    """
+    Retrieve one CDS request into target.
+
+    cdsapi writes into a .part file, which is only moved to target once it
+    passes _is_valid_grib, so an interrupted retrieve never leaves a
+    truncated target behind. Single chokepoint for every CDS download;
+    returns (status, target, error).
+    """
+    part = target.with_name(target.name + ".part")
+    try:
+        retrieve_with_retry(dataset, request, part)
+    except Exception as e:
+        if part.exists():
+            part.unlink()
+        return "error", target, e
+
+    if not _is_valid_grib(part):
+        part.unlink()
+        return "error", target, "downloaded file is not a valid GRIB"
+    os.replace(part, target)
+    _ok_marker(target).touch()
+    return "success", target, None
+
+
+def _build_request(variables, year, month, times, area, **extra):
+    """Build the CDS request shared by all days of a download (without "day")."""
+    request = {
+        "product_type": "reanalysis",
+        "format": "grib",
+        "variable": variables,
+        **extra,
+        "year": year,
+        "month": month,
+        "time": times,
+        # Native ERA5 resolution; stops the server from regridding
+        "grid": [0.25, 0.25],
+    }
+
+    if area is not None:
+        request["area"] = area  # [N, W, S, E]
+
+    return request
+
+
+def download_cds_jobs(dataset, label, request, jobs, concurrency):
+    """
+    Download (day, target) jobs for one CDS dataset.
+
+    day is a single day string or a list of days for a batched request.
+    Existing targets that pass the integrity check are skipped; invalid ones
+    are deleted and, like missing ones, retrieved concurrently with
+    request["day"] set per job.
+    """
+    pending = []
+    for day, target in jobs:
+        if _is_complete(target):
+            print(f"[SKIP] {target} already exists", flush=True)
+            continue
+        if target.exists():
+            # Empty or half-written file from an earlier crashed run
+            print(f"[WARN] {target} is incomplete or corrupt; downloading again", flush=True)
+            target.unlink()
+        pending.append((day, target))
+
+    def _retrieve(job):
+        day, target = job
+        day_desc = day if isinstance(day, str) else f"{day[0]}..{day[-1]}"
+        print(
+            f"[INFO] Downloading {label} for {request['year']}-{request['month']}-{day_desc} -> {target}",
+            flush=True,
+        )
+        return _download_cds(dataset, dict(request, day=day), target)
+
+    run_concurrently(_retrieve, pending, concurrency)
+
+
 def download_era5_pressure_levels(
     year: str,
     month: str,
@@ -24,10 +225,15 @@ def download_era5_pressure_levels(
     times: list,
     out_dir: str,
     area=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
 ):
     """
     Download ERA5 pressure-level data (one GRIB per day).
 
+    Pressure levels stay one request per day: a day of the 16 fields on 32
+    levels is already ~12,000 GRIB messages, so a month in one request
+    would exceed practical CDS request and response sizes.
+
     Parameters
     ----------
     year : str (e.g., "2014")
@@ -36,9 +242,9 @@ def download_era5_pressure_levels(
     times : list of str (e.g., ["00:00",...,"23:00"])
     out_dir : str, directory for output GRIB files
     area : list [N,W,S,E] or None for global
+    concurrency : int, number of days requested from CDS at once
     """
     ensure_dir(out_dir)
-    client = cdsapi.Client()
 
     variables = [
         "divergence",
@@ -69,38 +275,14 @@ def download_era5_pressure_levels(
         "975", "1000",
     ]
 
-    for day in days:
-        target = Path(out_dir) / f"era5_pl_{year}{month}{day}.grib"
-        if target.exists():
-            print(f"[SKIP] {target} already exists", flush=True)
-            continue
-
-        print(f"[INFO] Downloading pressure levels for {year}-{month}-{day} -> {target}", flush=True)
-
-        request = {
-            "product_type": "reanalysis",
-            "format": "grib",
-            "variable": variables,
-            "pressure_level": pressure_levels,
-            "year": year,
-            "month": month,
-            "day": day,
-            "time": times,
-        }
-
-        if area is not None:
-            request["area"] = area  # [N, W, S, E]
+    request = _build_request(
+        variables, year, month, times, area, pressure_level=pressure_levels
+    )
+    jobs = [(day, Path(out_dir) / f"era5_pl_{year}{month}{day}.grib") for day in days]
 
-        try:
-            client.retrieve(
-                "reanalysis-era5-pressure-levels",
-                request,
-                str(target),
-            )
-            print(f"[SUCCESS] Downloaded {target}", flush=True)
-        except Exception as e:
-            print(f"[ERROR] Failed to download {target}: {e}", flush=True)
-            sys.exit(1)
+    download_cds_jobs(
+        "reanalysis-era5-pressure-levels", "pressure levels", request, jobs, concurrency
+    )
 
 
 def download_era5_single_levels(
@@ -110,9 +292,16 @@ def download_era5_single_levels(
     times: list,
     out_dir: str,
     area=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    daily: bool = False,
 ):
     """
-    Download ERA5 single-level data (one GRIB per day).
+    Download ERA5 single-level data (one GRIB for all days, or one per day).
+
+    By default all days go into a single CDS request, so the month pays the
+    CDS queue wait once instead of once per day. A month of the 20 surface
+    fields is roughly 15,000 GRIB messages, well within what CDS accepts in
+    one request.
 
     Parameters
     ----------
@@ -122,9 +311,11 @@ def download_era5_single_levels(
     times : list of str
     out_dir : str
     area : list [N,W,S,E] or None
+    concurrency : int, only used with daily=True
+    daily : bool, write one GRIB per day (era5_sl_YYYYMMDD.grib) instead of
+        one for all days (era5_sl_YYYYMM.grib)
     """
     ensure_dir(out_dir)
-    client = cdsapi.Client()
 
     variables = [
         "10m_u_component_of_wind",
@@ -149,37 +340,26 @@ def download_era5_single_levels(
         "volumetric_soil_water_layer_4",
     ]
 
-    for day in days:
-        target = Path(out_dir) / f"era5_sl_{year}{month}{day}.grib"
-        if target.exists():
-            print(f"[SKIP] {target} already exists", flush=True)
-            continue
-
-        print(f"[INFO] Downloading single levels for {year}-{month}-{day} -> {target}", flush=True)
+    if not days:
+        return
 
-        request = {
-            "product_type": "reanalysis",
-            "format": "grib",
-            "variable": variables,
-            "year": year,
-            "month": month,
-            "day": day,
-            "time": times,
-        }
+    request = _build_request(variables, year, month, times, area)
 
-        if area is not None:
-            request["area"] = area  # [N, W, S, E]
-
-        try:
-            client.retrieve(
-                "reanalysis-era5-single-levels",
-                request,
-                str(target),
-            )
-            print(f"[SUCCESS] Downloaded {target}", flush=True)
-        except Exception as e:
-            print(f"[ERROR] Failed to download {target}: {e}", flush=True)
-            sys.exit(1)
+    if daily:
+        jobs = [(day, Path(out_dir) / f"era5_sl_{year}{month}{day}.grib") for day in days]
+    else:
+        # One request for all days; only name it as the whole month when
+        # every day of the month is included
+        days_in_month = calendar.monthrange(int(year), int(month))[1]
+        if set(days) >= {f"{d:02d}" for d in range(1, days_in_month + 1)}:
+            batch_name = f"era5_sl_{year}{month}.grib"
+        else:
+            batch_name = f"era5_sl_{year}{month}{days[0]}-{days[-1]}.grib"
+        jobs = [(days, Path(out_dir) / batch_name)]
+
+    download_cds_jobs(
+        "reanalysis-era5-single-levels", "single levels", request, jobs, concurrency
+    )
 
 
 def main():
@@ -216,12 +396,27 @@ def main():
         action="store_true",
         help="Skip single level download",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of CDS requests to queue at once (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--daily",
+        action="store_true",
+        help="Download single levels as one GRIB per day instead of one for all days",
+    )
 
     args = parser.parse_args()
 
     # Validate inputs
     year = args.year
     month = args.month.zfill(2)
+
+    if args.concurrency < 1:
+        print(f"[ERROR] --concurrency must be at least 1 (got {args.concurrency})", flush=True)
+        sys.exit(1)
     
     # Generate day list
     days = [f"{d:02d}" for d in range(args.start_day, args.end_day + 1)]
@@ -253,6 +448,7 @@ def main():
     print(f"Days:        {args.start_day} to {args.end_day} ({len(days)} days)", flush=True)
     print(f"Output Dir:  {args.out_dir}", flush=True)
     print(f"Area:        {'Global' if area is None else area}", flush=True)
+    print(f"Concurrency: {args.concurrency}", flush=True)
     print("=" * 80, flush=True)
 
     start_time = datetime.now()
@@ -267,6 +463,7 @@ def main():
             times=times,
             out_dir=pl_out_dir,
             area=area,
+            concurrency=args.concurrency,
         )
     else:
         print(f"\n[INFO] Skipping pressure level downloads", flush=True)
@@ -281,6 +478,8 @@ def main():
             times=times,
             out_dir=sl_out_dir,
             area=area,
+            concurrency=args.concurrency,
+            daily=args.daily,
         )
     else:
         print(f"\n[INFO] Skipping single level downloads", flush=True)
@@ -11,7 +11,18 @@ Variables downloaded match those required by era5_to_int.py:
 import os
 import sys
 import argparse
-import subprocess
+import calendar
+import configparser
+import functools
+import hashlib
+import itertools
+import json
+import re
+import tempfile
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -21,6 +32,44 @@ RDA_DATASET = "ds633.0"
 # Use THREDDS fileServer for direct HTTP downloads
 RDA_BASE_URL = "https://tds.gdex.ucar.edu/thredds/fileServer/files/g/d633000"
 
+# Shared HTTP session: every file comes from the same THREDDS host, so reusing
+# pooled connections avoids a new TCP/TLS handshake per download.
+# Failed requests are retried with exponential backoff (urllib3 2.x waits
+# 0, 4, 8, 16, 32 s before the five retries),
+# honouring Retry-After, so a rate-limited or busy server gets time to recover.
+# POOL_MAXSIZE bounds how many connections can be open at once, so worker
+# counts are capped to it (see download_files).
+POOL_MAXSIZE = 16
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=POOL_MAXSIZE,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=2.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+    ),
+))
+
+# Network read size and file write buffer (bytes), and (connect, read)
+# timeouts (seconds). 64 KiB reads keep latency low; the 1 MiB buffer
+# batches them into few write() syscalls.
+CHUNK_SIZE = 1 << 16
+WRITE_BUFFER = 1 << 20
+HTTP_TIMEOUT = (30, 300)
+
+# Default number of files downloaded at once (capped at POOL_MAXSIZE)
+DEFAULT_CONCURRENCY = 8
+
+# Number of HEAD probes in flight before downloading (see probe_file)
+PROBE_CONCURRENCY = POOL_MAXSIZE
+
+# Suffix of the per-file sidecar recording the ETag of the downloaded copy
+# (one file each, so concurrent jobs writing to one OUT_DIR never collide)
+ETAG_SUFFIX = ".etag"
+
 # ERA5 variable mappings for NCAR RDA (ECMWF parameter codes)
 # Format: 'WPS_NAME': ('ecmwf_param', 'level_type', 'description')
 PRESSURE_LEVEL_VARS = {
@@ -54,6 +103,15 @@ SINGLE_LEVEL_VARS = {
     'STL4': ('236', 'sfc', 'Soil temperature level 4'),
 }
 
+# SINGLE_LEVEL_VARS normalized once for building monthly filenames:
+# 'WPS_NAME': ('ecmwf_param', 'level_type', 'description', 'grid_type'), with
+# the parameter code zero-padded to 3 digits as used in RDA filenames
+# (e.g., 034 not 34). All surface files are on the scalar (sc) grid.
+_SINGLE_LEVEL_PLAN = {
+    name: (f"{int(param):03d}", level_type, desc, 'sc')
+    for name, (param, level_type, desc) in SINGLE_LEVEL_VARS.items()
+}
+
 # Pressure levels (hPa) - 37 levels used by ERA5
 PRESSURE_LEVELS = [
     1, 2, 3, 5, 7, 10, 20, 30, 50, 70,
@@ -62,6 +120,35 @@ PRESSURE_LEVELS = [
     850, 875, 900, 925, 950, 975, 1000
 ]
 
+# Variable short names and grid type (uv for winds, sc for scalars)
+_VAR_MAP = {
+    '129': ('z', 'sc'),     # Geopotential
+    '130': ('t', 'sc'),     # Temperature
+    '131': ('u', 'uv'),     # U wind
+    '132': ('v', 'uv'),     # V wind
+    '133': ('q', 'sc'),     # Specific humidity
+    '134': ('sp', 'sc'),    # Surface pressure
+    '151': ('msl', 'sc'),   # Mean sea level pressure
+    '167': ('2t', 'sc'),    # 2m temperature
+    '168': ('2d', 'sc'),    # 2m dewpoint
+    '165': ('10u', 'uv'),   # 10m U wind
+    '166': ('10v', 'uv'),   # 10m V wind
+    '34': ('sst', 'sc'),    # Sea surface temp
+    '235': ('skt', 'sc'),   # Skin temperature
+    '172': ('lsm', 'sc'),   # Land-sea mask
+    '31': ('ci', 'sc'),     # Sea ice cover
+    '141': ('sd', 'sc'),    # Snow depth
+    '33': ('rsn', 'sc'),    # Snow density
+    '39': ('swvl1', 'sc'),  # Soil moisture layer 1
+    '40': ('swvl2', 'sc'),  # Soil moisture layer 2
+    '41': ('swvl3', 'sc'),  # Soil moisture layer 3
+    '42': ('swvl4', 'sc'),  # Soil moisture layer 4
+    '139': ('stl1', 'sc'),  # Soil temperature layer 1
+    '170': ('stl2', 'sc'),  # Soil temperature layer 2
+    '183': ('stl3', 'sc'),  # Soil temperature layer 3
+    '236': ('stl4', 'sc'),  # Soil temperature layer 4
+}
+
 
 def check_credentials():
     """Check if RDA credentials are configured."""
@@ -85,6 +172,7 @@ def check_credentials():
     return True
 
 
+@functools.lru_cache(maxsize=4096)
 def build_rda_url(year, month, day, param, level_type):
     """
     Build NCAR RDA THREDDS download URL for ERA5 data.
@@ -98,36 +186,7 @@ def build_rda_url(year, month, day, param, level_type):
     """
     date_str = f"{year}{month:02d}{day:02d}"
     
-    # Variable short names and grid type (uv for winds, sc for scalars)
-    var_map = {
-        '129': ('z', 'sc'),     # Geopotential
-        '130': ('t', 'sc'),     # Temperature
-        '131': ('u', 'uv'),     # U wind
-        '132': ('v', 'uv'),     # V wind
-        '133': ('q', 'sc'),     # Specific humidity
-        '134': ('sp', 'sc'),    # Surface pressure
-        '151': ('msl', 'sc'),   # Mean sea level pressure
-        '167': ('2t', 'sc'),    # 2m temperature
-        '168': ('2d', 'sc'),    # 2m dewpoint
-        '165': ('10u', 'uv'),   # 10m U wind
-        '166': ('10v', 'uv'),   # 10m V wind
-        '34': ('sst', 'sc'),    # Sea surface temp
-        '235': ('skt', 'sc'),   # Skin temperature
-        '172': ('lsm', 'sc'),   # Land-sea mask
-        '31': ('ci', 'sc'),     # Sea ice cover
-        '141': ('sd', 'sc'),    # Snow depth
-        '33': ('rsn', 'sc'),    # Snow density
-        '39': ('swvl1', 'sc'),  # Soil moisture layer 1
-        '40': ('swvl2', 'sc'),  # Soil moisture layer 2
-        '41': ('swvl3', 'sc'),  # Soil moisture layer 3
-        '42': ('swvl4', 'sc'),  # Soil moisture layer 4
-        '139': ('stl1', 'sc'),  # Soil temperature layer 1
-        '170': ('stl2', 'sc'),  # Soil temperature layer 2
-        '183': ('stl3', 'sc'),  # Soil temperature layer 3
-        '236': ('stl4', 'sc'),  # Soil temperature layer 4
-    }
-    
-    var_short, grid_type = var_map.get(param, ('unknown', 'sc'))
+    var_short, grid_type = _VAR_MAP.get(param, ('unknown', 'sc'))
     
     # File naming pattern (files contain full day 00-23 UTC)
     filename = f"e5.oper.an.{level_type}.128_{param}_{var_short}.ll025{grid_type}.{date_str}00_{date_str}23.nc"
@@ -137,8 +196,12 @@ def build_rda_url(year, month, day, param, level_type):
     return url, filename
 
 
+@functools.lru_cache(maxsize=1)
 def get_rda_credentials():
-    """Get RDA credentials from config file or environment variables."""
+    """
+    Get RDA credentials from environment variables or the [RDA] section of
+    ~/.cdsapirc. Cached, so the file is read once per run.
+    """
     # Try environment variables first
     email = os.environ.get('RDA_EMAIL')
     api_key = os.environ.get('RDA_KEY')
@@ -147,88 +210,466 @@ def get_rda_credentials():
         return email, api_key
     
     # Try reading from config file
-    home = Path.home()
-    config_file = home / ".cdsapirc"
+    config_file = Path.home() / ".cdsapirc"
     
     if config_file.exists():
-        with open(config_file, 'r') as f:
-            lines = f.readlines()
-            in_rda_section = False
-            for line in lines:
-                line = line.strip()
-                if line == '[RDA]':
-                    in_rda_section = True
-                    continue
-                if in_rda_section and line.startswith('email:'):
-                    email = line.split(':', 1)[1].strip()
-                if in_rda_section and line.startswith('key:'):
-                    api_key = line.split(':', 1)[1].strip()
+        # The CDS url/key lines at the top of the file have no section
+        # header, so give them one before parsing
+        cp = configparser.ConfigParser(interpolation=None)
+        try:
+            cp.read_string("[CDS]\n" + config_file.read_text())
+        except configparser.Error as e:
+            print(f"  WARNING: Could not parse {config_file}: {e}")
+            return email, api_key
+        
+        if cp.has_section('RDA'):
+            email = cp['RDA'].get('email', email)
+            api_key = cp['RDA'].get('key', api_key)
     
     return email, api_key
 
 
-def download_file(url, output_path):
-    """Download a file using wget with RDA API key authentication."""
+def _etag_path(output_path):
+    """Path of the ETag sidecar for output_path."""
+    return output_path.with_name(output_path.name + ETAG_SUFFIX)
+
+
+def load_etag(output_path):
+    """Read the {etag, size, area} sidecar for output_path (None if missing or unreadable)."""
+    try:
+        with open(_etag_path(output_path), 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def save_etag(output_path, etag, area=None, clip_failed=False):
+    """
+    Record the ETag of a downloaded file (None if the server sent none), its
+    size on disk and the area requested for it (None for global) in its
+    sidecar. The local size is stored because clipped files (see
+    clip_to_area) no longer match the remote Content-Length. clip_failed
+    marks a file that was kept global because clipping to area failed.
+    """
+    entry = {
+        'etag': etag,
+        'size': output_path.stat().st_size,
+        'area': list(area) if area is not None else None,
+        'clip_failed': clip_failed,
+    }
+    fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix=output_path.name + ".",
+                                    suffix=ETAG_SUFFIX + ".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f, sort_keys=True)
+        os.replace(tmp_name, _etag_path(output_path))
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def is_valid_netcdf(path):
+    """
+    Cheap integrity check: more than 1 KiB and starts with the netCDF-4/HDF5
+    or classic netCDF magic bytes.
+    """
+    try:
+        if path.stat().st_size <= 1024:
+            return False
+        with open(path, 'rb') as f:
+            header = f.read(4)
+    except OSError:
+        return False
+    return header == b'\x89HDF' or header[:3] == b'CDF'
+
+
+def probe_file(url, output_path, auth, area=None):
+    """
+    Classify url with a single HEAD request.
+    
+    Returns:
+      'missing'  - the server has no such file (404)
+      'cached'   - the local copy is current: its stored ETag matches the
+                   remote one, it still has the size recorded at download
+                   time and it was downloaded for the requested area (or
+                   is global when area is None). A file whose clip failed
+                   stays cached for that area rather than being fetched
+                   again only to fail the same way. A global file with no stored
+                   entry (e.g. downloaded before ETags were tracked) is
+                   adopted and recorded if it has the remote Content-Length
+                   and passes is_valid_netcdf.
+      'download' - anything else, including probe errors (the GET reports them)
+    """
+    try:
+        resp = _SESSION.head(url, auth=auth, timeout=30, allow_redirects=True)
+        
+        if resp.status_code == 404:
+            return 'missing'
+        
+        if resp.status_code != 200 or not output_path.exists():
+            return 'download'
+        
+        remote_etag = resp.headers.get('ETag')
+        local_size = output_path.stat().st_size
+        
+        stored = load_etag(output_path)
+        if stored is None:
+            if area is not None:
+                return 'download'
+            remote_size = resp.headers.get('Content-Length')
+            if remote_size is None or int(remote_size) != local_size:
+                return 'download'
+            if not is_valid_netcdf(output_path):
+                return 'download'
+            save_etag(output_path, remote_etag)
+            return 'cached'
+        
+        wanted_area = list(area) if area is not None else None
+        # A file whose clip failed is still the global file
+        area_matches = (stored.get('area') == wanted_area
+                        or (wanted_area is None and stored.get('clip_failed')))
+        if (stored.get('etag') == remote_etag and stored.get('size') == local_size
+                and area_matches):
+            return 'cached'
+        return 'download'
+    except (requests.RequestException, ValueError, OSError):
+        # e.g. a malformed Content-Length or an unreadable local file
+        return 'download'
+
+
+def clip_to_area(path, area):
+    """
+    Clip a downloaded ERA5 netCDF file to area [N, W, S, E] in place and
+    rewrite it with zlib compression.
+    
+    ds633.0 has no server-side subsetting, so this saves disk space (not
+    bandwidth) for regional WRF domains. Requires xarray.
+    """
+    import xarray as xr
+    
+    north, west, south, east = area
+    
+    with xr.open_dataset(path) as ds:
+        # RDA grids use 0..359.75 longitudes and north-to-south latitudes
+        west, east = west % 360, east % 360
+        subset = ds.sel(latitude=slice(north, south))
+        if west <= east:
+            subset = subset.sel(longitude=slice(west, east))
+        else:
+            # Box crosses the 0 meridian
+            subset = xr.concat(
+                [subset.sel(longitude=slice(west, None)), subset.sel(longitude=slice(None, east))],
+                dim='longitude',
+            )
+        subset = subset.load()
+    
+    for var in subset.variables.values():
+        var.encoding = {}
+    encoding = {name: {'zlib': True, 'complevel': 4} for name in subset.data_vars}
+    
+    tmp_path = path.with_name(path.name + ".clip")
+    try:
+        subset.to_netcdf(tmp_path, encoding=encoding)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def drop_page_cache(path):
+    """
+    Tell the kernel we will not re-read path soon (posix_fadvise DONTNEED),
+    so finished downloads do not push other jobs' data out of the page cache.
+    No-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def fetch_expected_sha256(url, auth):
+    """
+    Return the published SHA-256 for url from its companion .sha256 file,
+    or None if the server does not provide one.
+    """
+    try:
+        resp = _SESSION.get(url + ".sha256", auth=auth, timeout=HTTP_TIMEOUT)
+    except requests.RequestException:
+        return None
+    
+    if resp.status_code != 200 or 'text/html' in resp.headers.get('Content-Type', ''):
+        return None
+    
+    # sha256sum format: "<hexdigest>  <filename>"
+    fields = resp.text.split()
+    return fields[0].lower() if fields else None
+
+
+def _discard_part(part_path):
+    """Remove a .part file and the ETag it was started with."""
+    for path in (part_path, part_path.with_name(part_path.name + ".etag")):
+        if path.exists():
+            path.unlink()
+
+
+def _content_range_total(resp, offset):
+    """
+    Return the full file size from a 206 response's Content-Range header, or
+    None if the header is missing or the range does not start at offset.
+    """
+    match = re.match(r'bytes (\d+)-\d+/(\d+)$', resp.headers.get('Content-Range', ''))
+    if not match or int(match.group(1)) != offset:
+        return None
+    return int(match.group(2))
+
+
+def download_file(url, output_path, area=None):
+    """
+    Download a file over the shared HTTP session with RDA API key authentication.
+    
+    The data is streamed to a .part file and hashed on the fly. It is only
+    moved to output_path once it matches the published SHA-256 (when RDA
+    provides one) or, at minimum, the expected size announced by the server.
+    
+    A .part file left behind by an interrupted run is resumed with an HTTP
+    Range request instead of being downloaded again from byte 0. The ETag the
+    .part was started with is kept next to it (.part.etag) and sent as
+    If-Range, so a file reissued on the server since then is downloaded from
+    scratch instead of being stitched onto the old bytes.
+    
+    If area [N, W, S, E] is given, the completed file is clipped to it.
+    
+    Returns 'downloaded' or 'failed'.
+    """
     
     email, api_key = get_rda_credentials()
     
     if not email or not api_key:
         print("  ERROR: RDA credentials not found")
-        return False
+        return 'failed'
     
-    # Use wget with HTTP basic authentication
-    cmd = [
-        'wget',
-        '--http-user', email,
-        '--http-password', api_key,
-        '--no-check-certificate',
-        '--tries=3',
-        '--timeout=300',
-        '-O', str(output_path),
-        url
-    ]
+    auth = (email, api_key)
     
     print(f"  Downloading: {output_path.name}")
     print(f"  URL: {url}")
     
+    part_path = output_path.with_name(output_path.name + ".part")
+    part_etag_path = part_path.with_name(part_path.name + ".etag")
+    
+    # Only resume a .part whose ETag is known; otherwise its bytes cannot be
+    # matched to the current remote file
+    offset = 0
+    part_etag = None
+    if part_path.exists():
+        if part_etag_path.exists():
+            part_etag = part_etag_path.read_text().strip() or None
+        if part_etag:
+            offset = part_path.stat().st_size
+        else:
+            _discard_part(part_path)
+    
     try:
-        result = subprocess.run(
-            cmd, 
-            check=True, 
-            stdout=subprocess.DEVNULL,  # Suppress progress output
-            stderr=subprocess.PIPE, 
-            universal_newlines=True
-        )
+        headers = {'Range': f'bytes={offset}-', 'If-Range': part_etag} if offset else {}
+        resp = _SESSION.get(url, auth=auth, headers=headers, stream=True, timeout=HTTP_TIMEOUT)
         
-        # Check if file was actually downloaded (not empty or error page)
-        if output_path.stat().st_size < 1000:
-            print(f"  WARNING: File size suspiciously small ({output_path.stat().st_size} bytes)")
-            # Check if it's an HTML error page
-            with open(output_path, 'rb') as f:
-                header = f.read(100)
-                if b'<html' in header.lower() or b'error' in header.lower():
-                    print(f"  ERROR: Downloaded file appears to be an error page")
-                    output_path.unlink()  # Delete bad file
-                    return False
+        total_size = None
+        if offset:
+            if resp.status_code == 206:
+                total_size = _content_range_total(resp, offset)
+                remote_etag = resp.headers.get('ETag', part_etag)
+                if total_size is None or remote_etag != part_etag:
+                    # Not a continuation of our partial file; start over
+                    resp.close()
+                    _discard_part(part_path)
+                    offset = 0
+                    resp = _SESSION.get(url, auth=auth, stream=True, timeout=HTTP_TIMEOUT)
+            elif resp.status_code == 416:
+                # Partial file no longer matches the remote file; start over
+                resp.close()
+                _discard_part(part_path)
+                offset = 0
+                resp = _SESSION.get(url, auth=auth, stream=True, timeout=HTTP_TIMEOUT)
+            elif resp.status_code == 200:
+                # File changed since the .part was started (If-Range) or the
+                # server ignored the Range header: this is the whole file
+                offset = 0
         
-        return True
-    except subprocess.CalledProcessError as e:
+        with resp:
+            resp.raise_for_status()
+            
+            if offset:
+                print(f"  Resuming from byte {offset}")
+            
+            # Check that we are not being served an HTML error/login page
+            content_type = resp.headers.get('Content-Type', '')
+            chunks = resp.iter_content(chunk_size=CHUNK_SIZE)
+            first_chunk = next(chunks, b'')
+            header = first_chunk[:100].lower()
+            if 'text/html' in content_type or (not offset and b'<html' in header):
+                print(f"  ERROR: Downloaded file appears to be an error page")
+                _discard_part(part_path)
+                return 'failed'
+            
+            etag = resp.headers.get('ETag')
+            
+            # Content-Length describes the encoded body, so only compare it
+            # against the bytes we write when no transfer encoding is applied
+            expected_size = total_size
+            if (expected_size is None and not offset
+                    and 'Content-Encoding' not in resp.headers and 'Content-Length' in resp.headers):
+                expected_size = int(resp.headers['Content-Length'])
+            
+            # Seed the hash with the bytes already on disk when resuming
+            h = hashlib.sha256()
+            if offset:
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        h.update(block)
+            else:
+                # Remember which version of the file this .part belongs to
+                if etag:
+                    part_etag_path.write_text(etag)
+                elif part_etag_path.exists():
+                    part_etag_path.unlink()
+            
+            nbytes = offset
+            with open(part_path, 'ab' if offset else 'wb', buffering=WRITE_BUFFER) as f:
+                for chunk in itertools.chain([first_chunk], chunks):
+                    f.write(chunk)
+                    h.update(chunk)
+                    nbytes += len(chunk)
+            drop_page_cache(part_path)
+        
+        expected_sha256 = fetch_expected_sha256(url, auth)
+        if expected_sha256 is not None:
+            if h.hexdigest() != expected_sha256:
+                print(f"  ERROR: SHA-256 mismatch (expected {expected_sha256}, got {h.hexdigest()})")
+                _discard_part(part_path)
+                return 'failed'
+        elif expected_size is not None and nbytes != expected_size:
+            print(f"  ERROR: Incomplete download ({nbytes} of {expected_size} bytes)")
+            _discard_part(part_path)
+            return 'failed'
+        
+        if not is_valid_netcdf(part_path):
+            print(f"  ERROR: Downloaded file is not a valid netCDF file")
+            _discard_part(part_path)
+            return 'failed'
+        
+        os.replace(part_path, output_path)
+    except requests.RequestException as e:
+        # Keep the .part file so the next attempt can resume from it
         print(f"  ERROR downloading {url}")
-        if e.stderr:
-            # Print full error message
-            print(f"  wget stderr:\n{e.stderr}")
-        # Clean up failed download
-        if output_path.exists():
-            output_path.unlink()
-        return False
+        print(f"  {type(e).__name__}: {e}")
+        return 'failed'
     except Exception as e:
         print(f"  UNEXPECTED ERROR: {type(e).__name__}: {e}")
-        if output_path.exists():
-            output_path.unlink()
-        return False
+        _discard_part(part_path)
+        return 'failed'
+    
+    # A verified file is in place from here on; bookkeeping failures are
+    # only warnings
+    try:
+        _discard_part(part_path)
+        
+        clip_failed = False
+        if area is not None:
+            try:
+                clip_to_area(output_path, area)
+            except Exception as e:
+                # Recorded in the sidecar so later runs with the same --area
+                # don't re-download the file only to fail clipping again
+                clip_failed = True
+                print(f"  WARNING: Could not clip {output_path.name} to area, keeping global file: {e}")
+                print(f"  (delete {output_path.name} to download and clip it again)")
+        
+        save_etag(output_path, etag, area, clip_failed)
+    except Exception as e:
+        print(f"  WARNING: {output_path.name} downloaded, but recording it failed: {type(e).__name__}: {e}")
+    return 'downloaded'
+
+
+def download_files(jobs, concurrency=DEFAULT_CONCURRENCY, area=None):
+    """
+    Download (url, output_path) pairs concurrently over the shared session.
+    
+    A HEAD probe pass (see probe_file) first sorts the jobs into files to
+    download, files already cached locally and files missing on the server,
+    so only the first group costs a GET. All files come from one host and
+    are independent, so keeping several transfers in flight brings wall time
+    close to the slowest file rather than the sum of all files.
+    
+    Returns (success_count, skip_count, fail_count); missing files count as
+    failures.
+    """
+    if not jobs:
+        return 0, 0, 0
+    
+    # More workers than pooled connections would only queue on the pool
+    concurrency = max(1, min(concurrency, POOL_MAXSIZE))
+    
+    email, api_key = get_rda_credentials()
+    if not email or not api_key:
+        print("  ERROR: RDA credentials not found")
+        return 0, 0, len(jobs)
+    auth = (email, api_key)
+    
+    with ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY) as executor:
+        statuses = list(executor.map(lambda job: probe_file(job[0], job[1], auth, area), jobs))
+    
+    to_download = []
+    skip_count = 0
+    fail_count = 0
+    for (url, output_path), status in zip(jobs, statuses):
+        if status == 'cached':
+            print(f"  [SKIP] {output_path.name} (unchanged)")
+            skip_count += 1
+        elif status == 'missing':
+            print(f"  [MISSING] {output_path.name} (not found on server)")
+            fail_count += 1
+        else:
+            to_download.append((url, output_path))
+    
+    success_count = 0
+    if to_download:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(download_file, url, output_path, area) for url, output_path in to_download]
+            for future in as_completed(futures):
+                if future.result() == 'downloaded':
+                    success_count += 1
+                else:
+                    fail_count += 1
+    
+    return success_count, skip_count, fail_count
+
+
+def select_vars(all_vars, variables):
+    """Restrict a *_LEVEL_VARS table to the requested WPS names (all if None)."""
+    if not variables:
+        return all_vars
+    return {k: v for k, v in all_vars.items() if k in variables}
 
 
-def download_era5_pressure_levels(year, month, days, out_dir, variables=None):
+def download_and_summarize(label, jobs, concurrency, area):
+    """Run download_files on jobs and print the per-level summary line."""
+    success_count, skip_count, fail_count = download_files(jobs, concurrency, area)
+    
+    print(f"\n{label} Summary: {success_count} downloaded, {skip_count} skipped, {fail_count} failed")
+    return success_count, skip_count, fail_count
+
+
+def download_era5_pressure_levels(year, month, days, out_dir, variables=None,
+                                  concurrency=DEFAULT_CONCURRENCY, area=None):
     """
     Download ERA5 pressure-level netCDF files from NCAR RDA.
     
@@ -238,10 +679,7 @@ def download_era5_pressure_levels(year, month, days, out_dir, variables=None):
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     
-    # Filter variables if specified
-    vars_to_download = PRESSURE_LEVEL_VARS
-    if variables:
-        vars_to_download = {k: v for k, v in PRESSURE_LEVEL_VARS.items() if k in variables}
+    vars_to_download = select_vars(PRESSURE_LEVEL_VARS, variables)
     
     print(f"\n{'='*80}")
     print(f"Downloading Pressure Level Variables")
@@ -252,33 +690,23 @@ def download_era5_pressure_levels(year, month, days, out_dir, variables=None):
     print(f"Output: {out_dir}")
     print(f"{'='*80}\n")
     
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
+    # Build the full (day, variable) download plan up front
+    plan = [
+        (day, var_name, desc, *build_rda_url(year, month, day, param, level_type))
+        for day in days
+        for var_name, (param, level_type, desc) in vars_to_download.items()
+    ]
     
-    for day in days:
-        for var_name, (param, level_type, desc) in vars_to_download.items():
-            
-            url, filename = build_rda_url(year, month, day, param, level_type)
-            output_file = out_dir / filename
-            
-            if output_file.exists():
-                print(f"  [SKIP] {filename} (already exists)")
-                skip_count += 1
-                continue
-            
-            print(f"  [{var_name}] {desc} - {year}-{month:02d}-{day:02d} (24h)")
-            
-            if download_file(url, output_file):
-                success_count += 1
-            else:
-                fail_count += 1
+    jobs = []
+    for day, var_name, desc, url, filename in plan:
+        print(f"  [{var_name}] {desc} - {year}-{month:02d}-{day:02d} (24h)")
+        jobs.append((url, out_dir / filename))
     
-    print(f"\nPressure Levels Summary: {success_count} downloaded, {skip_count} skipped, {fail_count} failed")
-    return success_count, skip_count, fail_count
+    return download_and_summarize("Pressure Levels", jobs, concurrency, area)
 
 
-def download_era5_single_levels(year, month, days, out_dir, variables=None):
+def download_era5_single_levels(year, month, days, out_dir, variables=None,
+                                concurrency=DEFAULT_CONCURRENCY, area=None):
     """
     Download ERA5 single-level netCDF files from NCAR RDA.
     
@@ -290,14 +718,13 @@ def download_era5_single_levels(year, month, days, out_dir, variables=None):
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     
-    # Filter variables if specified
-    vars_to_download = SINGLE_LEVEL_VARS
-    if variables:
-        vars_to_download = {k: v for k, v in SINGLE_LEVEL_VARS.items() if k in variables}
+    vars_to_download = select_vars(_SINGLE_LEVEL_PLAN, variables)
     
-    # Determine last day of month
-    import calendar
+    # Month metadata shared by every variable's filename and URL
     last_day = calendar.monthrange(year, month)[1]
+    start_datetime = f"{year}{month:02d}0100"
+    end_datetime = f"{year}{month:02d}{last_day}23"
+    url_prefix = f"{RDA_BASE_URL}/e5.oper.an.sfc/{year}{month:02d}/"
     
     print(f"\n{'='*80}")
     print(f"Downloading Single Level Variables")
@@ -308,42 +735,21 @@ def download_era5_single_levels(year, month, days, out_dir, variables=None):
     print(f"Output: {out_dir}")
     print(f"{'='*80}\n")
     
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
+    jobs = []
     
     # Download one file per variable for the entire month
-    for var_name, (param, level_type, desc) in vars_to_download.items():
+    for var_name, (param, level_type, desc, grid_type) in vars_to_download.items():
         # Build monthly filename
         # Format: e5.oper.an.sfc.128_134_sp.ll025sc.2014050100_2014053123.nc
-        # Note: param codes must be zero-padded to 3 digits (e.g., 034 not 34)
-        var_code, grid_type = param if isinstance(param, tuple) else (param, 'sc')
-        var_code_padded = f"{int(var_code):03d}"  # Pad to 3 digits
-        
-        # Construct filename for monthly data
-        start_datetime = f"{year}{month:02d}0100"
-        end_datetime = f"{year}{month:02d}{last_day}23"
-        filename = f"e5.oper.an.sfc.128_{var_code_padded}_{var_name.lower()}.ll025{grid_type}.{start_datetime}_{end_datetime}.nc"
+        filename = f"e5.oper.an.sfc.128_{param}_{var_name.lower()}.ll025{grid_type}.{start_datetime}_{end_datetime}.nc"
         
-        # Construct URL
-        url = f"{RDA_BASE_URL}/e5.oper.an.sfc/{year}{month:02d}/{filename}"
+        url = url_prefix + filename
         output_file = out_dir / filename
         
-        if output_file.exists():
-            print(f"  [SKIP] {filename} (already exists)")
-            skip_count += 1
-            continue
-        
         print(f"  [{var_name}] {desc} - {year}-{month:02d} (monthly)")
-        print(f"  Downloading: {filename}")
-        
-        if download_file(url, output_file):
-            success_count += 1
-        else:
-            fail_count += 1
+        jobs.append((url, output_file))
     
-    print(f"\nSingle Levels Summary: {success_count} downloaded, {skip_count} skipped, {fail_count} failed")
-    return success_count, skip_count, fail_count
+    return download_and_summarize("Single Levels", jobs, concurrency, area)
 
 
 def main():
@@ -375,9 +781,20 @@ Examples:
     parser.add_argument("--vars", type=str, help="Comma-separated list of variables (e.g., Z,T,U,V)")
     parser.add_argument("--skip-pressure", action="store_true", help="Skip pressure level downloads")
     parser.add_argument("--skip-single", action="store_true", help="Skip single level downloads")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Number of files to download at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--area", type=str,
+                        help="Clip files after download to N,W,S,E (e.g., '40,-120,25,-105'); requires xarray")
     
     args = parser.parse_args()
     
+    if args.concurrency < 1:
+        print(f"ERROR: --concurrency must be at least 1 (got {args.concurrency})")
+        sys.exit(1)
+    if args.concurrency > POOL_MAXSIZE:
+        print(f"WARNING: --concurrency capped at {POOL_MAXSIZE} (HTTP connection pool size)")
+        args.concurrency = POOL_MAXSIZE
+    
     # Check credentials
     if not check_credentials():
         sys.exit(1)
@@ -391,6 +808,22 @@ Examples:
         print("ERROR: Must specify either --day or both --start-day and --end-day")
         sys.exit(1)
     
+    # Parse area if provided
+    area = None
+    if args.area:
+        try:
+            area = [float(x) for x in args.area.split(',')]
+            if len(area) != 4:
+                raise ValueError("Area must have 4 values: N,W,S,E")
+        except Exception as e:
+            print(f"ERROR: Invalid area format: {e}")
+            sys.exit(1)
+        try:
+            import xarray  # noqa: F401
+        except ImportError:
+            print("ERROR: --area requires xarray (pip install xarray netCDF4)")
+            sys.exit(1)
+    
     # Parse variables
     variables = None
     if args.vars:
@@ -406,6 +839,8 @@ Examples:
     print(f"Note:        Each file contains all 24 hours (00-23 UTC)")
     print(f"Variables:   {variables if variables else 'All'}")
     print(f"Output Dir:  {args.out_dir}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Area:        {'Global' if area is None else area}")
     print("="*80)
     
     start_time = datetime.now()
@@ -418,7 +853,9 @@ Examples:
         pl_stats = download_era5_pressure_levels(
             args.year, args.month, days, 
             Path(args.out_dir) / "pressure_levels", 
-            variables
+            variables,
+            args.concurrency,
+            area
         )
     
     # Download single levels
@@ -426,7 +863,9 @@ Examples:
         sl_stats = download_era5_single_levels(
             args.year, args.month, days,
             Path(args.out_dir) / "single_levels",
-            variables
+            variables,
+            args.concurrency,
+            area
         )
     
     end_time = datetime.now()